@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+
+"""Argument parsing shared by generate-dockerfile.py and convert-config.py"""
+
+NPX_FLAGS = ('-y',)
+
+def first_package_arg(args, flags=NPX_FLAGS):
+    """Return the first non-flag argument, i.e. the package name, or None"""
+    return next((arg for arg in args if arg not in flags and not arg.startswith('-')), None)
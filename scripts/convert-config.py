@@ -1,48 +1,134 @@
 #!/usr/bin/env python3
 
-import json
 import sys
 import os
-import subprocess
-import glob
+import shutil
+import functools
 
+from command_args import NPX_FLAGS, first_package_arg
+from json_io import json_dumps, json_loads
+
+# Modules only needed when servers must be converted (subprocess,
+# concurrent.futures, ijson) are imported on first use to keep startup cheap
+
+# Well-known npm global roots, probed before falling back to `npm root -g`
+NPM_GLOBAL_ROOT_CANDIDATES = (
+    '/usr/local/lib/node_modules',
+    '/usr/lib/node_modules',
+    '/opt/homebrew/lib/node_modules',
+)
+
+@functools.lru_cache(maxsize=1)
+def _npm_global_root():
+    """Return the npm global root, resolved once per run, or None if npm cannot report it"""
+    # Derive the root from the environment or well-known paths to avoid
+    # paying Node.js startup for `npm root -g`
+    npm_prefix = os.environ.get('NPM_CONFIG_PREFIX')
+    if npm_prefix:
+        # npm itself uses the configured prefix, so never probe unrelated global trees
+        return os.path.join(npm_prefix, 'lib', 'node_modules')
+    
+    for candidate in NPM_GLOBAL_ROOT_CANDIDATES:
+        if os.path.isdir(candidate):
+            return candidate
+    
+    # Nothing found on disk - ask npm directly. Failures are returned as None
+    # so they are cached too and npm is spawned at most once per run
+    import subprocess
+    try:
+        npm_global_result = subprocess.run(['npm', 'root', '-g'],
+                                         capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Error resolving npm global root: {e}")
+        return None
+    return npm_global_result.stdout.strip()
+
+@functools.lru_cache(maxsize=None)
+def _which(binary_name):
+    """Memoized shutil.which"""
+    return shutil.which(binary_name)
+
+@functools.lru_cache(maxsize=1)
+def _ijson():
+    """Import ijson on first use, or return None if it is not installed"""
+    try:
+        import ijson
+    except ImportError:
+        return None
+    return ijson
+
+def _is_inside(path, directory):
+    """Return True if path is directory itself or lies below it"""
+    return os.path.commonpath([path, directory]) == directory
+
+def read_package_bin(package_json_path):
+    """Return the bin field of a package.json, or None if it has none"""
+    ijson = _ijson()
+    if ijson is not None:
+        # Stream the file and stop as soon as the bin field has been parsed
+        with open(package_json_path, 'rb') as f:
+            return next(ijson.items(f, 'bin'), None)
+    
+    fd = os.open(package_json_path, os.O_RDONLY)
+    try:
+        data = os.read(fd, os.fstat(fd).st_size)
+    finally:
+        os.close(fd)
+    return json_loads(data).get('bin')
+
+def _bin_from_str(bin_data, package_name):
+    """Single binary case - npm names it after the package"""
+    return package_name.rsplit('/', 1)[-1]
+
+def _bin_from_dict(bin_data, package_name):
+    """Multiple binaries case - return the first one"""
+    return next(iter(bin_data), None)
+
+def _bin_from_none(bin_data, package_name):
+    """No usable bin field"""
+    return None
+
+# Binary name resolver for each JSON type the package.json bin field can have
+_BIN_HANDLERS = {
+    str: _bin_from_str,
+    dict: _bin_from_dict,
+}
+
+@functools.lru_cache(maxsize=None)
 def find_binary_for_package(package_name):
     """Find the binary name for an npm package by reading its package.json"""
     try:
         # Try to find the package installation directory
-        npm_global_result = subprocess.run(['npm', 'root', '-g'], 
-                                         capture_output=True, text=True, check=True)
-        npm_global_root = npm_global_result.stdout.strip()
+        npm_global_root = _npm_global_root()
+        if npm_global_root is None:
+            print(f"Cannot look up {package_name}: npm global root unknown")
+            return None
         
         # Convert package name to directory path
         package_dir = os.path.join(npm_global_root, package_name)
         
-        if not os.path.exists(package_dir):
-            print(f"Package directory not found: {package_dir}")
-            return None
+        # Most packages ship a binary named after the package - skip the
+        # package.json lookup when that binary is on PATH and links into the package
+        guessed_binary = package_name.rsplit('/', 1)[-1]
+        hit = _which(guessed_binary)
+        if hit and _is_inside(os.path.realpath(hit), os.path.realpath(package_dir)):
+            return guessed_binary
         
         # Read the package.json to find binary definitions
         package_json_path = os.path.join(package_dir, 'package.json')
-        if not os.path.exists(package_json_path):
-            print(f"package.json not found: {package_json_path}")
+        try:
+            bin_data = read_package_bin(package_json_path)
+        except FileNotFoundError:
+            if not os.path.isdir(package_dir):
+                print(f"Package directory not found: {package_dir}")
+            else:
+                print(f"package.json not found: {package_json_path}")
             return None
         
-        with open(package_json_path, 'r') as f:
-            package_data = json.load(f)
-        
         # Check for binary definitions
-        bin_data = package_data.get('bin', {})
-        
-        if isinstance(bin_data, str):
-            # Single binary case
-            binary_name = os.path.basename(package_name)
-            if binary_name.startswith('@'):
-                binary_name = binary_name.split('/')[-1]
+        binary_name = _BIN_HANDLERS.get(type(bin_data), _bin_from_none)(bin_data, package_name)
+        if binary_name:
             return binary_name
-        elif isinstance(bin_data, dict):
-            # Multiple binaries case - return the first one
-            if bin_data:
-                return list(bin_data.keys())[0]
         
         print(f"No binary found in package.json for {package_name}")
         return None
@@ -51,45 +137,62 @@ def find_binary_for_package(package_name):
         print(f"Error finding binary for {package_name}: {e}")
         return None
 
+def parse_npx_args(args):
+    """Split npx args into the package name and the remaining arguments"""
+    package_name = first_package_arg(args)
+    if package_name is None:
+        return None, []
+    
+    # Drop the -y flag and the package itself, keep everything else in order
+    package_index = args.index(package_name)
+    remaining_args = [arg for i, arg in enumerate(args)
+                      if i != package_index and arg not in NPX_FLAGS]
+    
+    return package_name, remaining_args
+
 def convert_npx_to_binary(config):
     """Convert npx commands to direct binary calls for pre-installed packages"""
     
     if 'mcpServers' not in config:
         return config
     
-    converted_config = {"mcpServers": {}}
-    
+    # First pass: extract the npx package of every server
+    npx_servers = {}
     for server_name, server_config in config['mcpServers'].items():
-        new_server_config = server_config.copy()
         command = server_config.get('command', '')
         args = server_config.get('args', [])
         
         if command == 'npx' and args:
-            # Extract package name from npx args
-            package_name = None
-            remaining_args = []
-            
-            for i, arg in enumerate(args):
-                if arg == '-y':
-                    continue  # Skip -y flag
-                elif arg.startswith('@') or (not arg.startswith('-') and package_name is None):
-                    if not arg.startswith('-'):
-                        package_name = arg
-                        continue
-                
-                # Collect remaining args (non-package arguments)
-                remaining_args.append(arg)
-            
+            package_name, remaining_args = parse_npx_args(args)
             if package_name:
-                # Try to find the binary dynamically
-                binary_name = find_binary_for_package(package_name)
-                
-                if binary_name:
-                    new_server_config['command'] = binary_name
-                    new_server_config['args'] = remaining_args
-                    print(f"Converted {server_name}: npx {package_name} -> {binary_name}")
-                else:
-                    print(f"Warning: Could not find binary for {package_name}, keeping as npx")
+                npx_servers[server_name] = (package_name, remaining_args)
+    
+    # Look up binaries concurrently - each lookup is independent disk I/O
+    package_names = sorted({package_name for package_name, _ in npx_servers.values()})
+    binaries = {}
+    if package_names:
+        # Resolve the shared npm root once before fanning out so workers never race on it
+        _npm_global_root()
+        
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(32, len(package_names))) as executor:
+            binaries = dict(zip(package_names, executor.map(find_binary_for_package, package_names)))
+    
+    # Second pass: build the converted config from the lookup results
+    converted_config = {"mcpServers": {}}
+    
+    for server_name, server_config in config['mcpServers'].items():
+        new_server_config = server_config  # Untouched servers are reused as-is
+        
+        if server_name in npx_servers:
+            package_name, remaining_args = npx_servers[server_name]
+            binary_name = binaries.get(package_name)
+            
+            if binary_name:
+                new_server_config = {**server_config, 'command': binary_name, 'args': remaining_args}
+                print(f"Converted {server_name}: npx {package_name} -> {binary_name}")
+            else:
+                print(f"Warning: Could not find binary for {package_name}, keeping as npx")
         
         converted_config['mcpServers'][server_name] = new_server_config
     
@@ -104,15 +207,22 @@ def main():
         sys.exit(1)
     
     # Read original config
-    with open(source_config_file, 'r') as f:
-        original_config = json.load(f)
+    with open(source_config_file, 'rb') as f:
+        original_config = json_loads(f.read())
+    
+    # Nothing to convert - copy the config verbatim instead of re-serializing it
+    servers = original_config.get('mcpServers', {})
+    if not any(server_config.get('command') == 'npx' for server_config in servers.values()):
+        shutil.copyfile(source_config_file, target_config_file)
+        print(f"No npx commands to convert, copied config to {target_config_file}")
+        return
     
     # Convert npx commands to binary calls
     converted_config = convert_npx_to_binary(original_config)
     
     # Write converted config to writable location
-    with open(target_config_file, 'w') as f:
-        json.dump(converted_config, f, indent=2)
+    with open(target_config_file, 'wb') as f:
+        f.write(json_dumps(converted_config))
     
     print(f"Successfully converted config and saved to {target_config_file}")
 
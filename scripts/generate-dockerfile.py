@@ -3,14 +3,156 @@
 import json
 import sys
 import os
+import io
+import mmap
+import shutil
+import hashlib
+import tempfile
+from collections import defaultdict
+
+from command_args import first_package_arg
+from json_io import json_loads, orjson
+
+# Placeholder in Dockerfile.template expanded into the package install commands
+TEMPLATE_MARKER = b"{{range .MCPPackages}} && npm install -g {{.}}{{end}}"
+
+# Separator between the chained RUN commands in the Dockerfile
+INSTALL_SEPARATOR = " \\\n"
+
+# Install command for each package manager, in the order they run in the Dockerfile
+INSTALL_COMMANDS = {
+    'npm': "npm install -g",
+    'pip': "pip3 install --no-cache-dir --break-system-packages",
+    'uv': "uv tool install",
+}
+
+# With orjson, config.json files at or above this size are parsed from a memory map instead of read into memory
+MMAP_THRESHOLD = 64 * 1024
+
+# Generated Dockerfiles are cached here, keyed by a hash of their inputs
+CACHE_DIR = os.path.join(".cache", "dockerfile")
+
+# Stat fingerprint of the inputs from the last run, mapped to their content hash
+CACHE_STAMP_FILE = os.path.join(CACHE_DIR, "stamp.json")
+
+def load_config(config_file):
+    """Load config.json, parsing large files in place from a memory map when orjson is available"""
+    with open(config_file, 'rb') as f:
+        if orjson is None or os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            return json_loads(f.read())
+        # orjson parses the mapped pages directly, without copying them into a bytes object
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view)
+
+def generator_sources():
+    """Return this script and every local module it has imported from the scripts directory"""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sources = {os.path.abspath(__file__)}
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if path and os.path.dirname(os.path.abspath(path)) == script_dir:
+            sources.add(os.path.abspath(path))
+    return sorted(sources)
+
+def cache_key(*paths):
+    """Hash the contents of the given files into a cache key"""
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        # Length-prefix each file so bytes shifting between inputs change the key
+        digest.update(len(data).to_bytes(8, 'big'))
+        digest.update(data)
+    return digest.hexdigest()
+
+def stat_stamp(*paths):
+    """Return the (mtime_ns, size) fingerprint of the given files"""
+    return [[st.st_mtime_ns, st.st_size] for st in map(os.stat, paths)]
+
+def read_stamped_key(stamp):
+    """Return the cache key recorded for this stat fingerprint, or None"""
+    try:
+        with open(CACHE_STAMP_FILE, 'rb') as f:
+            stamp_mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+            saved = json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(saved, dict) or saved.get('inputs') != stamp:
+        return None
+    # An input modified in the same clock tick as the stamp may have changed
+    # without its mtime moving ("racy clean") - only trust strictly older inputs
+    if any(mtime_ns >= stamp_mtime_ns for mtime_ns, _ in stamp):
+        return None
+    return saved.get('key')
+
+def write_cache_file(path, data_source):
+    """Write a cache file atomically by filling a temp file in CACHE_DIR and renaming it into place"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            data_source(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Never leave a partial file behind for later runs to pick up
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+def write_stamped_key(stamp, key):
+    """Record the cache key for this stat fingerprint"""
+    stamp_data = json.dumps({'inputs': stamp, 'key': key}).encode('utf-8')
+    write_cache_file(CACHE_STAMP_FILE, lambda f: f.write(stamp_data))
+
+def store_cached_dockerfile(output_file, cached_file):
+    """Copy the generated Dockerfile into the cache"""
+    def copy_output(f):
+        with open(output_file, 'rb') as src:
+            shutil.copyfileobj(src, f)
+    write_cache_file(cached_file, copy_output)
+
+def render_template(template_file, output_file, install_commands):
+    """Stream the template into the output file, expanding the package marker"""
+    replacement = install_commands.encode('utf-8')
+    with open(template_file, 'rb') as template:
+        # Size the write buffer to hold the whole output so it is flushed with a single write(2)
+        buffer_size = max(io.DEFAULT_BUFFER_SIZE, os.fstat(template.fileno()).st_size + len(replacement))
+        with open(output_file, 'wb', buffering=buffer_size) as output:
+            for line in template:
+                if TEMPLATE_MARKER in line:
+                    if not replacement:
+                        # Skip this line if no packages
+                        continue
+                    # Replace with actual install commands
+                    line = line.replace(TEMPLATE_MARKER, replacement)
+                output.write(line)
+
+def _parse_npx(args):
+    """Parse npx args: ["-y", "@package/name", ...other args]"""
+    return 'npm', first_package_arg(args)
+
+def _parse_uvx(args):
+    """Parse uvx args: similar to npx but for Python packages"""
+    return 'uv', first_package_arg(args, flags=())
+
+def _parse_python(args):
+    """Parse python -m package calls"""
+    if len(args) >= 2 and args[0] == '-m':
+        return 'pip', args[1]
+    return 'pip', None
+
+# Package parser for each command that installs its package on demand
+COMMAND_PARSERS = {
+    'npx': _parse_npx,
+    'uvx': _parse_uvx,
+    'python': _parse_python,
+}
 
 def extract_packages_from_config(config):
     """Extract package names dynamically from config.json"""
-    packages = {
-        'npm': set(),
-        'pip': set(),
-        'uv': set()
-    }
+    packages = defaultdict(set)
     
     if 'mcpServers' not in config:
         return packages
@@ -19,38 +161,13 @@ def extract_packages_from_config(config):
         command = server_config.get('command', '')
         args = server_config.get('args', [])
         
-        if command == 'npx' and args:
-            # Parse npx args: ["−y", "@package/name", ...other args]
-            package_name = None
-            for i, arg in enumerate(args):
-                if arg.startswith('@') or (not arg.startswith('-') and i > 0):
-                    # Found package name (starts with @ or first non-flag arg)
-                    if not arg.startswith('-'):
-                        package_name = arg
-                        break
+        parser = COMMAND_PARSERS.get(command)
+        if parser is not None and args:
+            manager, package_name = parser(args)
             
             if package_name:
-                packages['npm'].add(package_name)
-                print(f"Found npm package for {server_name}: {package_name}")
-        
-        elif command == 'uvx' and args:
-            # Parse uvx args: similar to npx but for Python packages
-            package_name = None
-            for i, arg in enumerate(args):
-                if not arg.startswith('-') and i >= 0:
-                    package_name = arg
-                    break
-            
-            if package_name:
-                packages['uv'].add(package_name)
-                print(f"Found uv package for {server_name}: {package_name}")
-        
-        elif command == 'python' and args:
-            # Parse python -m package calls
-            if len(args) >= 2 and args[0] == '-m':
-                package_name = args[1]
-                packages['pip'].add(package_name)
-                print(f"Found pip package for {server_name}: {package_name}")
+                packages[manager].add(package_name)
+                print(f"Found {manager} package for {server_name}: {package_name}")
         
         else:
             # Direct binary commands - skip as they should be pre-installed
@@ -59,78 +176,58 @@ def extract_packages_from_config(config):
     return packages
 
 def generate_install_commands(packages):
-    """Generate install commands for different package managers"""
-    install_lines = []
-    
-    # npm packages
-    if packages['npm']:
-        npm_packages = sorted(packages['npm'])
-        for package in npm_packages:
-            install_lines.append(f" && npm install -g {package}")
-    
-    # pip packages
-    if packages['pip']:
-        pip_packages = sorted(packages['pip'])
-        for package in pip_packages:
-            install_lines.append(f" && pip3 install --no-cache-dir --break-system-packages {package}")
-    
-    # uv packages  
-    if packages['uv']:
-        uv_packages = sorted(packages['uv'])
-        for package in uv_packages:
-            install_lines.append(f" && uv tool install {package}")
-    
-    return install_lines
+    """Generate the chained install commands for different package managers"""
+    # One stream over all managers, in INSTALL_COMMANDS order, packages sorted within each
+    return "".join(
+        f"{INSTALL_SEPARATOR} && {install_command} {package}"
+        for manager, install_command in INSTALL_COMMANDS.items()
+        for package in sorted(packages[manager])
+    ).removeprefix(INSTALL_SEPARATOR)
 
-def main():
-    # File paths
-    config_file = "config.json"
-    template_file = "Dockerfile.template"
-    output_file = "Dockerfile"
-    
+def main(config_file="config.json", template_file="Dockerfile.template", output_file="Dockerfile"):
+    """Generate the Dockerfile; raises FileNotFoundError if config or template is missing"""
     # Check if required files exist
-    if not os.path.exists(config_file):
-        print(f"Error: {config_file} not found", file=sys.stderr)
-        sys.exit(1)
-    
-    if not os.path.exists(template_file):
-        print(f"Error: {template_file} not found", file=sys.stderr)
-        sys.exit(1)
+    for required_file in (config_file, template_file):
+        if not os.path.exists(required_file):
+            raise FileNotFoundError(f"{required_file} not found")
+    
+    # Reuse a previously generated Dockerfile when config, template and generator are unchanged
+    # The generator's own modules are inputs too, so logic changes invalidate the cache
+    inputs = (config_file, template_file, *generator_sources())
+    # Unchanged mtimes and sizes reuse the recorded hash without reading the inputs
+    stamp = stat_stamp(*inputs)
+    key = read_stamped_key(stamp)
+    if key is None:
+        key = cache_key(*inputs)
+    cached_file = os.path.join(CACHE_DIR, f"Dockerfile.{key}")
+    if os.path.exists(cached_file):
+        shutil.copyfile(cached_file, output_file)
+        write_stamped_key(stamp, key)
+        print(f"Using cached {output_file} ({cached_file})")
+        return
     
     # Read config.json
-    with open(config_file, 'r') as f:
-        config = json.load(f)
+    config = load_config(config_file)
     
     # Extract packages dynamically
     packages = extract_packages_from_config(config)
     
     # Generate install commands
-    install_lines = generate_install_commands(packages)
-    
-    # Read template
-    with open(template_file, 'r') as f:
-        template_content = f.readlines()
+    install_commands = generate_install_commands(packages)
     
-    # Process template
-    output_lines = []
-    for line in template_content:
-        if "{{range .MCPPackages}} && npm install -g {{.}}{{end}}" in line:
-            # Replace with actual install commands
-            if install_lines:
-                install_commands = " \\\n".join(install_lines)
-                line = line.replace("{{range .MCPPackages}} && npm install -g {{.}}{{end}}", install_commands)
-            else:
-                # Skip this line if no packages
-                continue
-        output_lines.append(line)
+    # Process template and write output in a single streaming pass
+    render_template(template_file, output_file, install_commands)
     
-    # Write output
-    with open(output_file, 'w') as f:
-        f.writelines(output_lines)
+    store_cached_dockerfile(output_file, cached_file)
+    write_stamped_key(stamp, key)
     
-    all_packages = list(packages['npm']) + list(packages['pip']) + list(packages['uv'])
+    all_packages = [package for manager in INSTALL_COMMANDS for package in packages[manager]]
     print(f"Generating {output_file} with packages: {' '.join(all_packages)}")
     print(f"Successfully generated {output_file}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+
+"""JSON helpers shared by generate-dockerfile.py and convert-config.py"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_loads(data):
+    """Parse JSON from bytes or str, preferring orjson when installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(obj):
+    """Serialize to 2-space indented JSON bytes, preferring orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode('utf-8')